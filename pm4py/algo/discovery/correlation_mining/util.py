@@ -1,6 +1,14 @@
 import numpy as np
 from pm4py.util.lp import solver
 from statistics import mean
+import pkgutil
+
+# cache of the matching kernels (see get_matching_stats_kernels)
+MATCHING_STATS_KERNELS = {}
+# number of timestamps that are matched by the interpreted kernels before compiling them with numba:
+# the interpreted kernels process ~5M timestamps per second, while the compilation costs ~0.4 s,
+# so small logs never pay the compilation
+MATCHING_STATS_JIT_THRESHOLD = 2000000
 
 
 def get_c_matrix(PS_matrix, duration_matrix, activities, activities_counter):
@@ -23,6 +31,9 @@ def get_c_matrix(PS_matrix, duration_matrix, activities, activities_counter):
     c_matrix
         C matrix
     """
+    # the matrixes could be provided in single precision: the costs of the LP are computed in double precision
+    PS_matrix = np.asarray(PS_matrix, dtype=np.float64)
+    duration_matrix = np.asarray(duration_matrix, dtype=np.float64)
     C_matrix = np.zeros((len(activities), len(activities)))
     for i in range(len(activities)):
         for j in range(len(activities)):
@@ -124,8 +135,8 @@ def resolve_LP(C_matrix, duration_matrix, activities, activities_counter):
     for idx, p in enumerate(points):
         if p > 0:
             dfg[(activities[edges[idx][0]], activities[edges[idx][1]])] = p
-            performance_dfg[(activities[edges[idx][0]], activities[edges[idx][1]])] = duration_matrix[
-                edges[idx][0], edges[idx][1]]
+            performance_dfg[(activities[edges[idx][0]], activities[edges[idx][1]])] = float(duration_matrix[
+                edges[idx][0], edges[idx][1]])
     return dfg, performance_dfg
 
 
@@ -175,10 +186,12 @@ def greedy_match_return_avg_time(ai, aj):
     times_mean
         Mean of times
     """
-    tm0 = calculate_time_match_fifo(ai, aj)
-    td0 = mean([x[1] - x[0] for x in tm0]) if tm0 else 0
-    tm1 = calculate_time_match_rlifo(ai, aj)
-    td1 = mean([x[1] - x[0] for x in tm1]) if tm1 else 0
+    ai = np.asarray(ai, dtype=np.float64)
+    aj = np.asarray(aj, dtype=np.float64)
+    s0, c0 = calculate_time_match_fifo_stats(ai, aj)
+    td0 = s0 / c0 if c0 > 0 else 0
+    s1, c1 = calculate_time_match_rlifo_stats(ai, aj)
+    td1 = s1 / c1 if c1 > 0 else 0
     return min(td0, td1)
 
 
@@ -248,3 +261,155 @@ def calculate_time_match_rlifo(ai, aj, times1=None):
             k = k - 1
         z = z - 1
     return times1
+
+
+def calculate_time_match_fifo_stats(ai, aj):
+    """
+    Associate the times between two arrays of timestamps using FIFO
+    (same matching as calculate_time_match_fifo) and returns the sum and the count
+    of the matched durations (through the kernel returned by get_matching_stats_kernels)
+
+    Parameters
+    --------------
+    ai
+        First array of timestamps
+    aj
+        Second array of timestamps
+
+    Returns
+    --------------
+    sum_times
+        Sum of the matched durations
+    count_times
+        Number of matched durations
+    """
+    return get_matching_stats_kernels(len(ai) + len(aj))[0](ai, aj)
+
+
+def calculate_time_match_rlifo_stats(ai, aj):
+    """
+    Associate the times between two arrays of timestamps using LIFO (start from end)
+    (same matching as calculate_time_match_rlifo) and returns the sum and the count
+    of the matched durations (through the kernel returned by get_matching_stats_kernels)
+
+    Parameters
+    --------------
+    ai
+        First array of timestamps
+    aj
+        Second array of timestamps
+
+    Returns
+    --------------
+    sum_times
+        Sum of the matched durations
+    count_times
+        Number of matched durations
+    """
+    return get_matching_stats_kernels(len(ai) + len(aj))[1](ai, aj)
+
+
+def get_matching_stats_kernels(num_timestamps=0):
+    """
+    Gets the kernels computing the sum and the count of the durations matched using FIFO and LIFO.
+    In the case numba is installed, they are compiled to native code once the number of timestamps
+    matched by the interpreted kernels reaches MATCHING_STATS_JIT_THRESHOLD
+    (so the compilation is paid only when it is amortized by the amount of matched timestamps)
+
+    Parameters
+    --------------
+    num_timestamps
+        Number of timestamps that are going to be matched by the kernels
+
+    Returns
+    --------------
+    kernels
+        Tuple (FIFO kernel, LIFO kernel)
+    """
+    if "kernels" not in MATCHING_STATS_KERNELS:
+        if "numba" not in MATCHING_STATS_KERNELS:
+            MATCHING_STATS_KERNELS["numba"] = pkgutil.find_loader("numba") is not None
+            MATCHING_STATS_KERNELS["processed"] = 0
+        kernels = (__time_match_fifo_stats, __time_match_rlifo_stats)
+        if not MATCHING_STATS_KERNELS["numba"]:
+            MATCHING_STATS_KERNELS["kernels"] = kernels
+        else:
+            MATCHING_STATS_KERNELS["processed"] += num_timestamps
+            if MATCHING_STATS_KERNELS["processed"] < MATCHING_STATS_JIT_THRESHOLD:
+                return kernels
+            from numba import njit
+            MATCHING_STATS_KERNELS["kernels"] = tuple(njit(cache=True)(kernel) for kernel in kernels)
+    return MATCHING_STATS_KERNELS["kernels"]
+
+
+def __time_match_fifo_stats(ai, aj):
+    """
+    Associate the times between two arrays of timestamps using FIFO
+    (same matching as calculate_time_match_fifo) and returns the sum and the count
+    of the matched durations
+
+    Parameters
+    --------------
+    ai
+        First array of timestamps
+    aj
+        Second array of timestamps
+
+    Returns
+    --------------
+    sum_times
+        Sum of the matched durations
+    count_times
+        Number of matched durations
+    """
+    sum_times = 0.0
+    count_times = 0
+    k = 0
+    z = 0
+    while k < len(ai):
+        while z < len(aj):
+            if ai[k] < aj[z]:
+                sum_times += aj[z] - ai[k]
+                count_times += 1
+                z = z + 1
+                break
+            z = z + 1
+        k = k + 1
+    return sum_times, count_times
+
+
+def __time_match_rlifo_stats(ai, aj):
+    """
+    Associate the times between two arrays of timestamps using LIFO (start from end)
+    (same matching as calculate_time_match_rlifo) and returns the sum and the count
+    of the matched durations
+
+    Parameters
+    --------------
+    ai
+        First array of timestamps
+    aj
+        Second array of timestamps
+
+    Returns
+    --------------
+    sum_times
+        Sum of the matched durations
+    count_times
+        Number of matched durations
+    """
+    sum_times = 0.0
+    count_times = 0
+    k = len(ai) - 1
+    z = len(aj) - 1
+    while z >= 0:
+        while k >= 0:
+            if ai[k] < aj[z]:
+                sum_times += aj[z] - ai[k]
+                count_times += 1
+                k = k - 1
+                break
+            k = k - 1
+        z = z - 1
+    return sum_times, count_times
+
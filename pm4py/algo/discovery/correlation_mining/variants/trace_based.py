@@ -2,8 +2,8 @@ from pm4py.util import exec_utils
 from enum import Enum
 from pm4py.util import constants, xes_constants
 from pm4py.objects.conversion.log import converter
+from pm4py.objects.log.log import EventLog
 from pm4py.algo.discovery.correlation_mining import util as cm_util
-from statistics import mean
 import numpy as np
 from collections import Counter
 import pandas as pd
@@ -40,7 +40,8 @@ def apply(log, parameters=None):
         Performance DFG (containing the estimated performance for the arcs)
     """
     traces_list, trace_grouped_list, activities, activities_counter = preprocess_log(log, activities=None,
-                                                                                     activities_counter=None)
+                                                                                     activities_counter=None,
+                                                                                     parameters=parameters)
 
     PS_matrix, duration_matrix = get_PS_duration_matrix(activities, trace_grouped_list, parameters=parameters)
 
@@ -102,8 +103,8 @@ def get_PS_duration_matrix(activities, trace_grouped_list, parameters=None):
     start_timestamp_key = exec_utils.get_param_value(Parameters.START_TIMESTAMP_KEY, parameters,
                                                      xes_constants.DEFAULT_TIMESTAMP_KEY)
 
-    PS_matrix = get_precede_succeed_matrix(activities, trace_grouped_list, timestamp_key, start_timestamp_key)
-    duration_matrix = get_duration_matrix(activities, trace_grouped_list, timestamp_key, start_timestamp_key)
+    PS_matrix, duration_matrix = get_precede_succeed_duration_matrix(activities, trace_grouped_list, timestamp_key,
+                                                                     start_timestamp_key)
 
     return PS_matrix, duration_matrix
 
@@ -126,9 +127,11 @@ def preprocess_log(log, activities=None, activities_counter=None, parameters=Non
     Returns
     --------------
     traces_list
-        List of simplified traces of the log
+        List of simplified traces of the log (None when the log is a dataframe, since the events are
+        grouped directly from its columns)
     trace_grouped_list
-        Grouped list of simplified traces (per activity)
+        Grouped list of simplified traces (per activity), containing for each trace and each activity
+        the arrays of timestamps/start timestamps of the events having such activity
     activities
         Activities of the log
     activities_counter
@@ -146,37 +149,94 @@ def preprocess_log(log, activities=None, activities_counter=None, parameters=Non
     index_key = exec_utils.get_param_value(Parameters.INDEX_KEY, parameters, DEFAULT_INDEX_KEY)
 
     if type(log) is pd.DataFrame:
-        # keep only the two columns before conversion
-        log = log[list(set([activity_key, timestamp_key, start_timestamp_key, caseid_key]))]
-
-    log = converter.apply(log, parameters=parameters)
-
-    traces_list = []
-    for trace in log:
-        trace_stream = [
-            {activity_key: trace[i][activity_key], timestamp_key: trace[i][timestamp_key].timestamp(),
-             start_timestamp_key: trace[i][start_timestamp_key].timestamp(), index_key: i} for
-            i in range(len(trace))]
-        trace_stream = sorted(trace_stream, key=lambda x: (x[start_timestamp_key], x[timestamp_key], x[index_key]))
-        traces_list.append(trace_stream)
-
-    if activities is None:
-        activities = sorted(list(set(y[activity_key] for x in traces_list for y in x)))
+        # the events are taken directly from the columns of the dataframe, without the conversion to an event log
+        traces_list = None
+        trace_idx = pd.factorize(log[caseid_key])[0].astype(np.int64)
+        n_traces = int(trace_idx.max()) + 1 if len(trace_idx) > 0 else 0
+        times = get_dataframe_timestamps(log, timestamp_key)
+        start_times = get_dataframe_timestamps(log, start_timestamp_key)
+        # sorts the events of each trace by start timestamp, timestamp and position in the dataframe
+        order = np.lexsort((np.arange(len(log)), times, start_times, trace_idx))
+        trace_idx = trace_idx[order]
+        times = times[order]
+        start_times = start_times[order]
+        act_values = log[activity_key].values[order]
+        if activities is None:
+            activities = sorted(list(set(act_values)))
+        if activities_counter is None:
+            activities_counter = Counter(act_values)
+        codes = pd.Categorical(act_values, categories=activities).codes.astype(np.int64)
+        # the activities that are not in the list get the last code
+        codes[codes < 0] = len(activities)
+    else:
+        if not isinstance(log, EventLog):
+            # an event log is already in the expected form
+            log = converter.apply(log, parameters=parameters)
+
+        traces_list = []
+        for trace in log:
+            trace_stream = [
+                {activity_key: trace[i][activity_key], timestamp_key: trace[i][timestamp_key].timestamp(),
+                 start_timestamp_key: trace[i][start_timestamp_key].timestamp(), index_key: i} for
+                i in range(len(trace))]
+            trace_stream = sorted(trace_stream,
+                                  key=lambda x: (x[start_timestamp_key], x[timestamp_key], x[index_key]))
+            traces_list.append(trace_stream)
+
+        if activities is None:
+            activities = sorted(list(set(y[activity_key] for x in traces_list for y in x)))
+        if activities_counter is None:
+            activities_counter = Counter(y[activity_key] for x in traces_list for y in x)
+
+        # encodes the activities as integers (the activities that are not in the list get the last code)
+        activities_idx = {act: idx for idx, act in enumerate(activities)}
+        codes = np.array([activities_idx.get(y[activity_key], len(activities)) for x in traces_list for y in x],
+                         dtype=np.int64)
+        n_traces = len(traces_list)
+        trace_idx = np.repeat(np.arange(n_traces, dtype=np.int64), [len(x) for x in traces_list])
+        times = np.array([y[timestamp_key] for x in traces_list for y in x], dtype=np.float64)
+        start_times = np.array([y[start_timestamp_key] for x in traces_list for y in x], dtype=np.float64)
+
+    n_codes = len(activities) + 1
+    # a single (stable) sort of the events of the log by trace and activity: the events of the same activity
+    # keep the order of the trace
+    bucket = trace_idx * n_codes + codes
+    order = np.argsort(bucket, kind="stable")
+    bounds = np.searchsorted(bucket[order], np.arange(n_traces * n_codes + 1)).tolist()
+    # store the timestamps of the events of each activity as arrays, once for all the pairs of activities
+    times = times[order]
+    start_times = start_times[order]
 
     trace_grouped_list = []
-    for trace in traces_list:
+    for t in range(n_traces):
         gr = []
-        for act in activities:
-            act_gr = [x for x in trace if x[activity_key] == act]
-            gr.append(act_gr)
+        for a in range(t * n_codes, t * n_codes + len(activities)):
+            gr.append({timestamp_key: times[bounds[a]:bounds[a + 1]],
+                       start_timestamp_key: start_times[bounds[a]:bounds[a + 1]]})
         trace_grouped_list.append(gr)
 
-    if activities_counter is None:
-        activities_counter = Counter(y[activity_key] for x in traces_list for y in x)
-
     return traces_list, trace_grouped_list, activities, activities_counter
 
 
+def get_dataframe_timestamps(df, timestamp_key):
+    """
+    Gets the values of a timestamp column of a dataframe as seconds from the epoch
+
+    Parameters
+    --------------
+    df
+        Dataframe
+    timestamp_key
+        Timestamp column
+
+    Returns
+    --------------
+    timestamps
+        Array of timestamps (seconds from the epoch)
+    """
+    return df[timestamp_key].values.astype("datetime64[ns]").astype(np.int64) / 10 ** 9
+
+
 def get_precede_succeed_matrix(activities, trace_grouped_list, timestamp_key, start_timestamp_key):
     """
     Calculates the precede succeed matrix
@@ -186,7 +246,8 @@ def get_precede_succeed_matrix(activities, trace_grouped_list, timestamp_key, st
     activities
         Sorted list of activities of the log
     trace_grouped_list
-        A list of lists of lists, containing for each trace and each activity the events having such activity
+        A list of lists, containing for each trace and each activity the (sorted) timestamps of the events
+        having such activity
     timestamp_key
         The key to be used as timestamp
     start_timestamp_key
@@ -195,28 +256,23 @@ def get_precede_succeed_matrix(activities, trace_grouped_list, timestamp_key, st
     Returns
     ---------------
     mat
-        The precede succeed matrix
+        The precede succeed matrix (single precision)
     """
-    ret = np.zeros((len(activities), len(activities)))
+    ret = np.zeros((len(activities), len(activities)), dtype=np.float32)
     for i in range(len(activities)):
         for j in range(len(activities)):
             if not i == j:
                 count = 0
                 total = 0
                 for tr in trace_grouped_list:
-                    ai = [x[timestamp_key] for x in tr[i]]
-                    aj = [x[start_timestamp_key] for x in tr[j]]
-                    if ai and aj:
+                    ai = tr[i][timestamp_key]
+                    aj = tr[j][start_timestamp_key]
+                    if len(ai) > 0 and len(aj) > 0:
                         total += len(ai) * len(aj)
-                        k = 0
-                        z = 0
-                        while k < len(ai):
-                            while z < len(aj):
-                                if ai[k] < aj[z]:
-                                    break
-                                z = z + 1
-                            count = count + (len(aj) - z)
-                            k = k + 1
+                        # aj is sorted: for each element of ai, count the elements of aj that are greater.
+                        # the running maximum keeps the scan monotone when ai is not sorted
+                        idx = np.searchsorted(aj, np.maximum.accumulate(ai), side="right")
+                        count += int((len(aj) - idx).sum())
                 if total > 0:
                     ret[i, j] = count / float(total)
     return ret
@@ -231,7 +287,8 @@ def get_duration_matrix(activities, trace_grouped_list, timestamp_key, start_tim
     activities
         Sorted list of activities of the log
     trace_grouped_list
-        A list of lists of lists, containing for each trace and each activity the events having such activity
+        A list of lists, containing for each trace and each activity the (sorted) timestamps of the events
+        having such activity
     timestamp_key
         The key to be used as timestamp
     start_timestamp_key
@@ -240,21 +297,226 @@ def get_duration_matrix(activities, trace_grouped_list, timestamp_key, start_tim
     Returns
     --------------
     mat
-        The duration matrix
+        The duration matrix (single precision)
     """
-    ret = np.zeros((len(activities), len(activities)))
+    ret = np.zeros((len(activities), len(activities)), dtype=np.float32)
     for i in range(len(activities)):
-        for j in range(len(activities)):
-            if not i == j:
-                tm0 = []
-                tm1 = []
-                for tr in trace_grouped_list:
-                    ai = [x[timestamp_key] for x in tr[i]]
-                    aj = [x[start_timestamp_key] for x in tr[j]]
-                    if ai and aj:
-                        tm0 = cm_util.calculate_time_match_fifo(ai, aj, times0=tm0)
-                        tm1 = cm_util.calculate_time_match_rlifo(ai, aj, times1=tm1)
-                td0 = mean([x[1] - x[0] for x in tm0]) if tm0 else 0
-                td1 = mean([x[1] - x[0] for x in tm1]) if tm1 else 0
-                ret[i, j] = min(td0, td1)
+        # the cells (i, j) and (j, i) are computed together, in a single pass over the traces
+        for j in range(i + 1, len(activities)):
+            sums = [0.0, 0.0, 0.0, 0.0]
+            counts = [0, 0, 0, 0]
+            for tr in trace_grouped_list:
+                if len(tr[i][timestamp_key]) > 0 and len(tr[j][timestamp_key]) > 0:
+                    for k, (ai, aj) in enumerate(((tr[i][timestamp_key], tr[j][start_timestamp_key]),
+                                                  (tr[j][timestamp_key], tr[i][start_timestamp_key]))):
+                        s, c = cm_util.calculate_time_match_fifo_stats(ai, aj)
+                        sums[2 * k] += s
+                        counts[2 * k] += c
+                        s, c = cm_util.calculate_time_match_rlifo_stats(ai, aj)
+                        sums[2 * k + 1] += s
+                        counts[2 * k + 1] += c
+            td = [sums[k] / counts[k] if counts[k] > 0 else 0 for k in range(4)]
+            ret[i, j] = min(td[0], td[1])
+            ret[j, i] = min(td[2], td[3])
     return ret
+
+
+def get_precede_succeed_duration_matrix(activities, trace_grouped_list, timestamp_key, start_timestamp_key):
+    """
+    Calculates the precede succeed matrix and the duration matrix
+    with a single pass over the grouped list of traces.
+
+    The timestamps of the events of each activity are concatenated (in the order of the traces),
+    and compared through integer keys that respect the order of the timestamps inside
+    a trace and are strictly increasing between consecutive traces, so every pair of activities
+    is handled by a few vectorized operations.
+
+    Parameters
+    --------------
+    activities
+        Sorted list of activities of the log
+    trace_grouped_list
+        A list of lists, containing for each trace and each activity the (sorted) timestamps of the events
+        having such activity
+    timestamp_key
+        The key to be used as timestamp
+    start_timestamp_key
+        The key to be used as start timestamp
+
+    Returns
+    --------------
+    PS_matrix
+        The precede succeed matrix (single precision)
+    duration_matrix
+        The duration matrix (single precision)
+    """
+    # the matrixes are stored in single precision, while the sums of the durations are accumulated in double precision
+    PS_matrix = np.zeros((len(activities), len(activities)), dtype=np.float32)
+    duration_matrix = np.zeros((len(activities), len(activities)), dtype=np.float32)
+    if not trace_grouped_list or not activities:
+        return PS_matrix, duration_matrix
+
+    # for each trace and each activity, the number of events
+    counts = np.array([[len(tr[a][timestamp_key]) for a in range(len(activities))] for tr in trace_grouped_list],
+                      dtype=np.int64)
+    # for each activity, the offsets of the traces in the concatenated arrays
+    offsets = np.zeros((len(trace_grouped_list) + 1, len(activities)), dtype=np.int64)
+    offsets[1:] = np.cumsum(counts, axis=0)
+    trace_idx = [np.repeat(np.arange(len(trace_grouped_list)), counts[:, a]) for a in range(len(activities))]
+    times = [np.concatenate([tr[a][timestamp_key] for tr in trace_grouped_list]) for a in range(len(activities))]
+    start_times = [np.concatenate([tr[a][start_timestamp_key] for tr in trace_grouped_list]) for a in
+                   range(len(activities))]
+    keys, start_keys = get_trace_keys(times, start_times, trace_idx)
+
+    def compute_cell(i, j, total):
+        ki = keys[i]
+        kj = start_keys[j]
+        # for each event of i, the position of the first event of j (in the same trace) with greater key.
+        # the running maximum keeps the scan monotone when the keys of i are not sorted
+        idx = np.searchsorted(kj, np.maximum.accumulate(ki), side="right")
+        count = int((offsets[trace_idx[i] + 1, j] - idx).sum())
+        PS_matrix[i, j] = count / float(total)
+        sum0, count0 = calculate_fifo_stats(times[i], start_times[j], trace_idx[i], offsets[:, i], offsets[:, j], idx)
+        sum1, count1 = calculate_rlifo_stats(times[i], start_times[j], ki, kj, trace_idx[j], offsets[:, i],
+                                             offsets[:, j])
+        td0 = sum0 / count0 if count0 > 0 else 0
+        td1 = sum1 / count1 if count1 > 0 else 0
+        duration_matrix[i, j] = min(td0, td1)
+
+    for i in range(len(activities)):
+        # the cells (i, j) and (j, i) are computed together (each unordered pair of activities is visited once)
+        for j in range(i + 1, len(activities)):
+            # the number of couples of events of the two activities is the same in both directions
+            total = int(counts[:, i].dot(counts[:, j]))
+            if total > 0:
+                compute_cell(i, j, total)
+                compute_cell(j, i, total)
+
+    return PS_matrix, duration_matrix
+
+
+def get_trace_keys(times, start_times, trace_idx):
+    """
+    Assigns to each timestamp an integer key, such that the keys respect the order of the timestamps
+    inside the same trace, and the keys of a trace are greater than the keys of the previous traces
+
+    Parameters
+    --------------
+    times
+        For each activity, the concatenated timestamps of its events
+    start_times
+        For each activity, the concatenated start timestamps of its events
+    trace_idx
+        For each activity, the index of the trace of each of its events
+
+    Returns
+    --------------
+    keys
+        For each activity, the keys of the timestamps
+    start_keys
+        For each activity, the keys of the start timestamps
+    """
+    all_times = np.concatenate(times + start_times)
+    all_traces = np.concatenate(trace_idx + trace_idx)
+    order = np.lexsort((all_times, all_traces))
+    sorted_times = all_times[order]
+    sorted_traces = all_traces[order]
+    is_new = np.ones(len(order), dtype=np.int64)
+    is_new[1:] = (sorted_times[1:] != sorted_times[:-1]) | (sorted_traces[1:] != sorted_traces[:-1])
+    all_keys = np.empty(len(order), dtype=np.int64)
+    all_keys[order] = np.cumsum(is_new)
+    splits = np.cumsum([len(x) for x in times + start_times])[:-1]
+    all_keys = np.split(all_keys, splits)
+    return all_keys[:len(times)], all_keys[len(times):]
+
+
+def calculate_fifo_stats(ti, tj, trace_idx_i, offsets_i, offsets_j, idx):
+    """
+    Associate (inside each trace) the times of two activities using FIFO
+    (same matching as calculate_time_match_fifo), and returns the sum and the count
+    of the matched durations
+
+    Parameters
+    --------------
+    ti
+        Concatenated timestamps of the first activity
+    tj
+        Concatenated start timestamps of the second activity
+    trace_idx_i
+        Index of the trace of each event of the first activity
+    offsets_i
+        Offsets of the traces in the concatenated timestamps of the first activity
+    offsets_j
+        Offsets of the traces in the concatenated timestamps of the second activity
+    idx
+        For each event of the first activity, the position of the first event of the second activity
+        (in the same trace) that has a greater key than all the previous events of the first activity
+
+    Returns
+    --------------
+    sum_times
+        Sum of the matched durations
+    count_times
+        Number of matched durations
+    """
+    local_idx = np.arange(len(ti)) - offsets_i[trace_idx_i]
+    # separates the traces, so the running maximum is restarted at the beginning of each trace
+    sep = trace_idx_i * (len(ti) + len(tj) + 1)
+    # the k-th event of the first activity is matched to max(idx[k], z[k-1] + 1)
+    z = local_idx + np.maximum.accumulate(idx - local_idx + sep) - sep
+    mask = z < offsets_j[trace_idx_i + 1]
+    return float((tj[z[mask]] - ti[mask]).sum()), int(mask.sum())
+
+
+def calculate_rlifo_stats(ti, tj, ki, kj, trace_idx_j, offsets_i, offsets_j):
+    """
+    Associate (inside each trace) the times of two activities using LIFO (start from end)
+    (same matching as calculate_time_match_rlifo), and returns the sum and the count
+    of the matched durations
+
+    Parameters
+    --------------
+    ti
+        Concatenated timestamps of the first activity
+    tj
+        Concatenated start timestamps of the second activity
+    ki
+        Keys of the timestamps of the first activity
+    kj
+        Keys of the start timestamps of the second activity
+    trace_idx_j
+        Index of the trace of each event of the second activity
+    offsets_i
+        Offsets of the traces in the concatenated timestamps of the first activity
+    offsets_j
+        Offsets of the traces in the concatenated timestamps of the second activity
+
+    Returns
+    --------------
+    sum_times
+        Sum of the matched durations
+    count_times
+        Number of matched durations
+    """
+    if np.any(ki[1:] < ki[:-1]):
+        # the timestamps of the first activity are not sorted inside some trace
+        sum_times = 0.0
+        count_times = 0
+        for t in np.unique(trace_idx_j):
+            s, c = cm_util.calculate_time_match_rlifo_stats(ti[offsets_i[t]:offsets_i[t + 1]],
+                                                             tj[offsets_j[t]:offsets_j[t + 1]])
+            sum_times += s
+            count_times += c
+        return float(sum_times), count_times
+    tj = tj[::-1]
+    trace_idx_j = trace_idx_j[::-1]
+    # position of the event inside its trace, starting from the end
+    local_idx = offsets_j[trace_idx_j + 1] - 1 - np.arange(len(tj) - 1, -1, -1)
+    # separates the traces, so the running minimum is restarted at the end of each trace
+    sep = trace_idx_j * (len(ti) + len(tj) + 2)
+    # the k-th event (from the end) of the second activity is matched to min(c[k], z[k-1] - 1)
+    # where c[k] is the last event of the first activity with a smaller key
+    c = np.searchsorted(ki, kj[::-1], side="left") - 1
+    z = np.minimum.accumulate(c + local_idx + sep) - sep - local_idx
+    mask = z >= offsets_i[trace_idx_j]
+    return float((tj[mask] - ti[z[mask]]).sum()), int(mask.sum())
@@ -1,17 +1,152 @@
-from copy import copy
+from collections import defaultdict, deque
+from datetime import datetime, timedelta, timezone
+from math import fsum
 from statistics import stdev
 
-from pm4py.objects.petri import semantics
+import numpy as np
+
 from pm4py.objects.petri.petrinet import PetriNet
-from pm4py.util.vis_utils import human_readable_stat, get_arc_penwidth, get_trans_freq_color
-from statistics import median, mean
+from pm4py.util.vis_utils import human_readable_stat, human_readable_stat_batch
+from pm4py.util.vis_utils import get_arc_penwidth, get_trans_freq_color
+from statistics import median
 from pm4py.objects.log.log import EventLog
 from pm4py.util.business_hours import BusinessHours
 
 MAX_NO_THREADS = 1000
+# minimum number of arcs for which the performance labels are computed with a single vectorized call
+# (below it, the setup of the numpy arrays costs more than formatting the labels one at a time)
+MIN_ARCS_BATCH_LABELS = 500
 
 
-def calculate_annotation_for_trace(trace, net, initial_marking, act_trans, activity_key, ht_perf_method="last"):
+def get_transitions_meta(net):
+    """
+    Gets, for each transition of the Petri net, the list of its input arcs, the list of its output arcs
+    and its label (avoiding repeated attribute lookups during the annotation of the traces)
+
+    Parameters
+    -----------
+    net
+        Petri net
+
+    Returns
+    -----------
+    trans_meta
+        Dictionary associating to each transition the tuple (input arcs, output arcs, label)
+    """
+    return {t: (list(t.in_arcs), list(t.out_arcs), t.label) for t in net.transitions}
+
+
+def get_marking_table(net):
+    """
+    Precompiles the firing rule of the transitions of the Petri net on markings represented
+    as arrays of tokens (indexed by the identifier of the place)
+
+    Parameters
+    -----------
+    net
+        Petri net
+
+    Returns
+    -----------
+    place_id
+        Dictionary associating to each place its identifier
+    transitions
+        List of transitions (the position of a transition is its identifier)
+    enabling
+        Tuple (transitions, starts, places, tokens) containing, for the transitions having input arcs,
+        the input places along with the number of tokens required to enable the transition (the input
+        places of the i-th of these transitions start at the i-th position of starts)
+    trans_ops
+        Dictionary associating to each transition the tuple (identifier, consumed places, consumed tokens,
+        produced places, produced tokens)
+    """
+    place_id = {p: i for i, p in enumerate(net.places)}
+    transitions = list(net.transitions)
+    enabling_trans = []
+    enabling_starts = []
+    enabling_places = []
+    enabling_tokens = []
+    trans_ops = {}
+    for t_idx, t in enumerate(transitions):
+        required = {}
+        consumed = {}
+        produced = {}
+        for arc in t.in_arcs:
+            p_idx = place_id[arc.source]
+            # each input arc is checked separately for the enabling, while the consumed tokens are summed up
+            required[p_idx] = max(required.get(p_idx, 0), arc.weight)
+            consumed[p_idx] = consumed.get(p_idx, 0) + arc.weight
+        for arc in t.out_arcs:
+            p_idx = place_id[arc.target]
+            produced[p_idx] = produced.get(p_idx, 0) + arc.weight
+        if required:
+            enabling_trans.append(t_idx)
+            enabling_starts.append(len(enabling_places))
+            enabling_places.extend(required.keys())
+            enabling_tokens.extend(required.values())
+        trans_ops[t] = (t_idx, np.array(list(consumed.keys()), dtype=np.int64),
+                        np.array(list(consumed.values()), dtype=np.int64),
+                        np.array(list(produced.keys()), dtype=np.int64),
+                        np.array(list(produced.values()), dtype=np.int64))
+    enabling = (np.array(enabling_trans, dtype=np.int64), np.array(enabling_starts, dtype=np.int64),
+                np.array(enabling_places, dtype=np.int64), np.array(enabling_tokens, dtype=np.int64))
+    return place_id, transitions, enabling, trans_ops
+
+
+def get_enabled_transitions_mask(marking, marking_table):
+    """
+    Gets the transitions enabled in a marking (represented as array of tokens)
+
+    Parameters
+    -----------
+    marking
+        Array containing the number of tokens of each place
+    marking_table
+        Firing rule of the transitions on the array markings (see get_marking_table)
+
+    Returns
+    -----------
+    enabled
+        Boolean array that tells, for each transition, if it is enabled in the marking
+    """
+    place_id, transitions, enabling, trans_ops = marking_table
+    enabling_trans, enabling_starts, enabling_places, enabling_tokens = enabling
+    # the transitions without input arcs are always enabled
+    enabled = np.ones(len(transitions), dtype=bool)
+    if len(enabling_trans) > 0:
+        enabled[enabling_trans] = np.minimum.reduceat(marking[enabling_places] - enabling_tokens,
+                                                      enabling_starts) >= 0
+    return enabled
+
+
+def weak_execute_on_array(trans, marking, marking_table):
+    """
+    Executes a transition even if it is not enabled, on a marking represented as array of tokens
+    (the places never get a negative number of tokens)
+
+    Parameters
+    -----------
+    trans
+        Transition
+    marking
+        Array containing the number of tokens of each place
+    marking_table
+        Firing rule of the transitions on the array markings (see get_marking_table)
+
+    Returns
+    -----------
+    new_marking
+        Array containing the number of tokens of each place after the execution
+    """
+    t_idx, consumed_ids, consumed_tokens, produced_ids, produced_tokens = marking_table[3][trans]
+    new_marking = marking.copy()
+    new_marking[consumed_ids] = np.maximum(new_marking[consumed_ids] - consumed_tokens, 0)
+    new_marking[produced_ids] += produced_tokens
+    return new_marking
+
+
+def calculate_annotation_for_trace(trace, net, initial_marking, act_trans, activity_key, ht_perf_method="last",
+                                   trans_meta=None, marking_table=None):
     """
     Calculate annotation for a trace in the variant, in order to retrieve information
     useful for calculate frequency/performance for all the traces belonging to the variant
@@ -31,62 +166,73 @@ def calculate_annotation_for_trace(trace, net, initial_marking, act_trans, activ
     ht_perf_method
         Method to use in order to annotate hidden transitions (performance value could be put on the last possible
         point (last) or in the first possible point (first)
+    trans_meta
+        (If provided) input arcs, output arcs and label of each transition (see get_transitions_meta)
+    marking_table
+        (If provided) firing rule of the transitions on the array markings (see get_marking_table)
 
     Returns
     ----------
     annotation
         Statistics annotation for the given trace
     """
-    annotations_places_trans = {}
-    annotations_arcs = {}
+    if trans_meta is None:
+        trans_meta = get_transitions_meta(net)
+    if marking_table is None:
+        marking_table = get_marking_table(net)
+    place_id, transitions, enabling, trans_ops = marking_table
+    # the transitions are inserted at their first access, while the places are inserted explicitly
+    annotations_places_trans = defaultdict(lambda: {"count": 0, "performance": [], "no_of_times_enabled": 0,
+                                                    "no_of_times_activated": 0})
+    # the count of an arc is the number of times it is reached in the trace (1)
+    annotations_arcs = defaultdict(lambda: {"performance": [], "count": 1})
     trace_place_stats = {}
     current_trace_index = 0
     j = 0
-    marking = copy(initial_marking)
-    for place in marking:
+    # the marking is an array containing the number of tokens of each place
+    marking = np.zeros(len(place_id), dtype=np.int64)
+    for place in initial_marking:
+        marking[place_id[place]] = initial_marking[place]
         if place not in annotations_places_trans:
             annotations_places_trans[place] = {"count": 0}
-            annotations_places_trans[place]["count"] = annotations_places_trans[place]["count"] + marking[place]
-        trace_place_stats[place] = [current_trace_index] * marking[place]
-
-    for z in range(len(act_trans)):
-        enabled_trans_in_marking = semantics.enabled_transitions(net, marking)
-        # print("enabled_trans_in_marking", enabled_trans_in_marking)
-
-        for trans in enabled_trans_in_marking:
-            if trans not in annotations_places_trans:
-                annotations_places_trans[trans] = {"count": 0, "performance": [], "no_of_times_enabled": 0,
-                                                   "no_of_times_activated": 0}
-            annotations_places_trans[trans]["no_of_times_enabled"] = annotations_places_trans[trans][
-                                                                         "no_of_times_enabled"] + 1
-
-        trans = act_trans[z]
-        if trans not in annotations_places_trans:
-            annotations_places_trans[trans] = {"count": 0, "performance": [], "no_of_times_enabled": 0,
-                                               "no_of_times_activated": 0}
-        annotations_places_trans[trans]["count"] = annotations_places_trans[trans]["count"] + 1
-        if trans not in enabled_trans_in_marking:
-            annotations_places_trans[trans]["no_of_times_enabled"] = annotations_places_trans[trans][
-                                                                         "no_of_times_enabled"] + 1
-        annotations_places_trans[trans]["no_of_times_activated"] = annotations_places_trans[trans][
-                                                                       "no_of_times_activated"] + 1
-
-        new_marking = semantics.weak_execute(trans, marking)
-        if not new_marking:
+            annotations_places_trans[place]["count"] = annotations_places_trans[place]["count"] + initial_marking[
+                place]
+        trace_place_stats[place] = deque([current_trace_index] * initial_marking[place])
+    # number of times each transition is enabled in the reached markings
+    times_enabled = np.zeros(len(transitions), dtype=np.int64)
+
+    len_trace = len(trace)
+    for trans in act_trans:
+        enabled_trans_in_marking = get_enabled_transitions_mask(marking, marking_table)
+        times_enabled += enabled_trans_in_marking
+
+        in_arcs, out_arcs, label = trans_meta[trans]
+        t_idx = trans_ops[trans][0]
+        # the performance of a hidden transition is annotated at the first possible point if requested
+        annotate_at_current = label or ht_perf_method == "first"
+        trans_annotation = annotations_places_trans[trans]
+        trans_annotation["count"] += 1
+        if not enabled_trans_in_marking[t_idx]:
+            trans_annotation["no_of_times_enabled"] += 1
+        trans_annotation["no_of_times_activated"] += 1
+
+        new_marking = weak_execute_on_array(trans, marking, marking_table)
+        if not new_marking.any():
             break
-        marking_diff = set(new_marking).difference(set(marking))
-        for place in marking_diff:
+        # only the output places of the transition could be added to the marking
+        for arc in out_arcs:
+            place = arc.target
             if place not in annotations_places_trans:
-                annotations_places_trans[place] = {"count": 0}
-                annotations_places_trans[place]["count"] = annotations_places_trans[place]["count"] + max(
-                    new_marking[place] - marking[place], 1)
+                p_idx = place_id[place]
+                if new_marking[p_idx] > 0 and marking[p_idx] == 0:
+                    annotations_places_trans[place] = {"count": max(int(new_marking[p_idx]), 1)}
         marking = new_marking
-        if j < len(trace):
+        if j < len_trace:
             current_trace_index = j
-            if trans.label == trace[j][activity_key]:
+            if label == trace[j][activity_key]:
                 j = j + 1
 
-        in_arc_indexes = [trace_place_stats[arc.source][0] for arc in trans.in_arcs if
+        in_arc_indexes = [trace_place_stats[arc.source][0] for arc in in_arcs if
                           arc.source in trace_place_stats and trace_place_stats[arc.source]]
         if in_arc_indexes:
             min_in_arc_indexes = min(in_arc_indexes)
@@ -96,32 +242,29 @@ def calculate_annotation_for_trace(trace, net, initial_marking, act_trans, activ
             max_in_arc_indexes = None
         performance_for_this_trans_execution = []
 
-        for arc in trans.in_arcs:
+        for arc in in_arcs:
             source_place = arc.source
-            if arc not in annotations_arcs:
-                annotations_arcs[arc] = {"performance": [], "count": 0}
-                annotations_arcs[arc]["count"] = annotations_arcs[arc]["count"] + 1
-            if source_place in trace_place_stats and trace_place_stats[source_place]:
-                if trans.label or ht_perf_method == "first":
-                    annotations_arcs[arc]["performance"].append(
-                        [current_trace_index, trace_place_stats[source_place][0]])
+            arc_annotation = annotations_arcs[arc]
+            source_place_stats = trace_place_stats.get(source_place)
+            if source_place_stats:
+                # consumes the oldest token of the place (FIFO)
+                source_index = source_place_stats.popleft()
+                if annotate_at_current:
+                    arc_annotation["performance"].append([current_trace_index, source_index])
                     performance_for_this_trans_execution.append(
-                        [[current_trace_index, trace_place_stats[source_place][0]],
-                         current_trace_index - trace_place_stats[source_place][0]])
+                        [[current_trace_index, source_index], current_trace_index - source_index])
                 elif min_in_arc_indexes:
-                    annotations_arcs[arc]["performance"].append([current_trace_index, current_trace_index])
+                    arc_annotation["performance"].append([current_trace_index, current_trace_index])
                     performance_for_this_trans_execution.append([[current_trace_index, current_trace_index], 0])
-
-                del trace_place_stats[source_place][0]
-        for arc in trans.out_arcs:
+        for arc in out_arcs:
             target_place = arc.target
+            # the output arcs get an annotation (without performance values) when the transition fires
             if arc not in annotations_arcs:
-                annotations_arcs[arc] = {"performance": [], "count": 0}
-                annotations_arcs[arc]["count"] = annotations_arcs[arc]["count"] + 1
+                annotations_arcs[arc] = {"performance": [], "count": 1}
             if target_place not in trace_place_stats:
-                trace_place_stats[target_place] = []
+                trace_place_stats[target_place] = deque()
 
-            if trans.label or ht_perf_method == "first":
+            if annotate_at_current:
                 trace_place_stats[target_place].append(current_trace_index)
             elif max_in_arc_indexes:
                 trace_place_stats[target_place].append(max_in_arc_indexes)
@@ -129,9 +272,47 @@ def calculate_annotation_for_trace(trace, net, initial_marking, act_trans, activ
         if performance_for_this_trans_execution:
             performance_for_this_trans_execution = sorted(performance_for_this_trans_execution, key=lambda x: x[1])
 
-            annotations_places_trans[trans]["performance"].append(performance_for_this_trans_execution[0][0])
+            trans_annotation["performance"].append(performance_for_this_trans_execution[0][0])
+
+    for t_idx in np.flatnonzero(times_enabled):
+        annotations_places_trans[transitions[t_idx]]["no_of_times_enabled"] += int(times_enabled[t_idx])
+
+    return dict(annotations_places_trans), dict(annotations_arcs)
+
+
+def get_traces_timestamps(log, timestamp_key="time:timestamp"):
+    """
+    Gets, for each trace of the log, the list of the timestamps of its events expressed as integer microseconds
+    since the epoch (None if the event has no timestamp).
+    Naive timestamps are taken as they are (without any conversion from the local time), so the difference
+    of two values is always the difference of the datetimes. The traces mixing naive and aware timestamps
+    (that cannot be compared) get None instead of the list
+
+    Parameters
+    -------------
+    log
+        Log
+    timestamp_key
+        Timestamp key
 
-    return annotations_places_trans, annotations_arcs
+    Returns
+    -------------
+    traces_timestamps
+        List containing, for each trace, the list of the timestamps of its events
+    """
+    naive_epoch = datetime(1970, 1, 1)
+    aware_epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    microsecond = timedelta(microseconds=1)
+    traces_timestamps = []
+    for trace in log:
+        timestamps = [event[timestamp_key] if timestamp_key in event else None for event in trace]
+        aware = {x.utcoffset() is not None for x in timestamps if x is not None}
+        if len(aware) > 1:
+            traces_timestamps.append(None)
+        else:
+            epoch = aware_epoch if True in aware else naive_epoch
+            traces_timestamps.append([(x - epoch) // microsecond if x is not None else None for x in timestamps])
+    return traces_timestamps
 
 
 def single_element_statistics(log, net, initial_marking, aligned_traces, variants_idx, activity_key="concept:name",
@@ -173,65 +354,70 @@ def single_element_statistics(log, net, initial_marking, aligned_traces, variant
     worktiming = parameters["worktiming"] if "worktiming" in parameters else [7, 17]
     weekends = parameters["weekends"] if "weekends" in parameters else [6, 7]
 
-    statistics = {}
+    # the places and the transitions are inserted at their first access, while the arcs are inserted explicitly
+    statistics = defaultdict(lambda: {"count": 0, "performance": [], "log_idx": [], "no_of_times_enabled": 0,
+                                      "no_of_times_activated": 0})
+    trans_meta = get_transitions_meta(net)
+    marking_table = get_marking_table(net)
+    # outside business hours, the performance is obtained from the difference between the integer timestamps
+    # (in microseconds), which is the same as the difference of the datetimes
+    traces_timestamps = get_traces_timestamps(log, timestamp_key=timestamp_key) if not business_hours else None
+
+    def get_perf(trace_idx, perf_couple):
+        # performance between the events at the positions perf_couple[1] and perf_couple[0] of the trace
+        if not business_hours and traces_timestamps[trace_idx] is not None:
+            timestamp1 = traces_timestamps[trace_idx][perf_couple[0]]
+            timestamp0 = traces_timestamps[trace_idx][perf_couple[1]]
+            if timestamp1 is not None and timestamp0 is not None:
+                return (timestamp1 - timestamp0) / 1000000
+            return 0.0
+        event1 = log[trace_idx][perf_couple[0]]
+        event0 = log[trace_idx][perf_couple[1]]
+        if timestamp_key in event1 and timestamp_key in event0:
+            if business_hours:
+                bh = BusinessHours(event0[timestamp_key].replace(tzinfo=None),
+                                   event1[timestamp_key].replace(tzinfo=None), worktiming=worktiming,
+                                   weekends=weekends)
+                return bh.getseconds()
+            return (event1[timestamp_key] - event0[timestamp_key]).total_seconds()
+        return 0.0
 
     for variant in variants_idx:
-        first_trace = log[variants_idx[variant][0]]
-        act_trans = aligned_traces[variants_idx[variant][0]]["activated_transitions"]
+        variant_traces = variants_idx[variant]
+        variant_count = len(variant_traces)
+        first_trace = log[variant_traces[0]]
+        act_trans = aligned_traces[variant_traces[0]]["activated_transitions"]
         annotations_places_trans, annotations_arcs = calculate_annotation_for_trace(first_trace, net, initial_marking,
                                                                                     act_trans, activity_key,
-                                                                                    ht_perf_method=ht_perf_method)
-
-        for el in annotations_places_trans:
-            if el not in statistics:
-                statistics[el] = {"count": 0, "performance": [], "log_idx": [], "no_of_times_enabled": 0,
-                                  "no_of_times_activated": 0}
-            statistics[el]["count"] += annotations_places_trans[el]["count"] * len(variants_idx[variant])
-            if "no_of_times_enabled" in annotations_places_trans[el]:
-                statistics[el]["no_of_times_enabled"] += annotations_places_trans[el]["no_of_times_enabled"] * len(
-                    variants_idx[variant])
-                statistics[el]["no_of_times_activated"] += annotations_places_trans[el]["no_of_times_activated"] * len(
-                    variants_idx[variant])
-
-            if "performance" in annotations_places_trans[el]:
-                for trace_idx in variants_idx[variant]:
-                    trace = log[trace_idx]
-                    for perf_couple in annotations_places_trans[el]["performance"]:
-                        if timestamp_key in trace[perf_couple[0]] and timestamp_key in trace[perf_couple[1]]:
-                            if business_hours:
-                                bh = BusinessHours(trace[perf_couple[1]][timestamp_key].replace(tzinfo=None),
-                                                   trace[perf_couple[0]][timestamp_key].replace(tzinfo=None),
-                                                   worktiming=worktiming,
-                                                   weekends=weekends)
-                                perf = bh.getseconds()
-                            else:
-                                perf = (trace[perf_couple[0]][timestamp_key] - trace[perf_couple[1]][
-                                    timestamp_key]).total_seconds()
-                        else:
-                            perf = 0.0
-                        statistics[el]["performance"].append(perf)
-                        statistics[el]["log_idx"].append(trace_idx)
-        for el in annotations_arcs:
+                                                                                    ht_perf_method=ht_perf_method,
+                                                                                    trans_meta=trans_meta,
+                                                                                    marking_table=marking_table)
+
+        for el, annotation in annotations_places_trans.items():
+            el_stats = statistics[el]
+            el_stats["count"] += annotation["count"] * variant_count
+            if "no_of_times_enabled" in annotation:
+                el_stats["no_of_times_enabled"] += annotation["no_of_times_enabled"] * variant_count
+                el_stats["no_of_times_activated"] += annotation["no_of_times_activated"] * variant_count
+
+            if "performance" in annotation:
+                el_performance = el_stats["performance"]
+                el_log_idx = el_stats["log_idx"]
+                for trace_idx in variant_traces:
+                    for perf_couple in annotation["performance"]:
+                        el_performance.append(get_perf(trace_idx, perf_couple))
+                        el_log_idx.append(trace_idx)
+        for el, annotation in annotations_arcs.items():
             if el not in statistics:
                 statistics[el] = {"count": 0, "performance": []}
-            statistics[el]["count"] += annotations_arcs[el]["count"] * len(variants_idx[variant])
-            for trace_idx in variants_idx[variant]:
-                trace = log[trace_idx]
-                for perf_couple in annotations_arcs[el]["performance"]:
-                    if timestamp_key in trace[perf_couple[0]] and timestamp_key in trace[perf_couple[1]]:
-                        if business_hours:
-                            bh = BusinessHours(trace[perf_couple[1]][timestamp_key].replace(tzinfo=None),
-                                               trace[perf_couple[0]][timestamp_key].replace(tzinfo=None), worktiming=worktiming,
-                                               weekends=weekends)
-                            perf = bh.getseconds()
-                        else:
-                            perf = (trace[perf_couple[0]][timestamp_key] - trace[perf_couple[1]][
-                                timestamp_key]).total_seconds()
-                    else:
-                        perf = 0.0
-                    statistics[el]["performance"].append(perf)
-
-    return statistics
+            el_stats = statistics[el]
+            el_stats["count"] += annotation["count"] * variant_count
+            el_performance = el_stats["performance"]
+            for trace_idx in variant_traces:
+                for perf_couple in annotation["performance"]:
+                    el_performance.append(get_perf(trace_idx, perf_couple))
+
+    return dict(statistics)
 
 
 def find_min_max_trans_frequency(statistics):
@@ -250,15 +436,8 @@ def find_min_max_trans_frequency(statistics):
     max_frequency
         Maximum transition frequency (in the replay)
     """
-    min_frequency = 9999999999
-    max_frequency = 0
-    for elem in statistics.keys():
-        if type(elem) is PetriNet.Transition:
-            if statistics[elem]["count"] < min_frequency:
-                min_frequency = statistics[elem]["count"]
-            if statistics[elem]["count"] > max_frequency:
-                max_frequency = statistics[elem]["count"]
-    return min_frequency, max_frequency
+    counts = [stat["count"] for elem, stat in statistics.items() if type(elem) is PetriNet.Transition]
+    return min(counts, default=0), max(counts, default=0)
 
 
 def find_min_max_arc_frequency(statistics):
@@ -277,15 +456,8 @@ def find_min_max_arc_frequency(statistics):
     max_frequency
         Maximum arc frequency
     """
-    min_frequency = 9999999999
-    max_frequency = 0
-    for elem in statistics.keys():
-        if type(elem) is PetriNet.Arc:
-            if statistics[elem]["count"] < min_frequency:
-                min_frequency = statistics[elem]["count"]
-            if statistics[elem]["count"] > max_frequency:
-                max_frequency = statistics[elem]["count"]
-    return min_frequency, max_frequency
+    counts = [stat["count"] for elem, stat in statistics.items() if type(elem) is PetriNet.Arc]
+    return min(counts, default=0), max(counts, default=0)
 
 
 def aggregate_stats(statistics, elem, aggregation_measure):
@@ -307,18 +479,20 @@ def aggregate_stats(statistics, elem, aggregation_measure):
         Aggregated statistics
     """
     aggr_stat = 0
+    performance = statistics[elem]["performance"]
     if aggregation_measure == "mean" or aggregation_measure is None:
-        aggr_stat = mean(statistics[elem]["performance"])
+        # float mean over an exact sum (statistics.mean uses exact fractions, which is much slower)
+        aggr_stat = fsum(performance) / len(performance)
     elif aggregation_measure == "median":
-        aggr_stat = median(statistics[elem]["performance"])
+        aggr_stat = median(performance)
     elif aggregation_measure == "stdev":
-        aggr_stat = stdev(statistics[elem]["performance"])
+        aggr_stat = stdev(performance)
     elif aggregation_measure == "sum":
-        aggr_stat = sum(statistics[elem]["performance"])
+        aggr_stat = sum(performance)
     elif aggregation_measure == "min":
-        aggr_stat = min(statistics[elem]["performance"])
+        aggr_stat = min(performance)
     elif aggregation_measure == "max":
-        aggr_stat = max(statistics[elem]["performance"])
+        aggr_stat = max(performance)
 
     return aggr_stat
 
@@ -341,17 +515,52 @@ def find_min_max_arc_performance(statistics, aggregation_measure):
     max_performance
         Maximum performance
     """
-    min_performance = 9999999999
-    max_performance = 0
-    for elem in statistics.keys():
-        if type(elem) is PetriNet.Arc:
-            if statistics[elem]["performance"]:
-                aggr_stat = aggregate_stats(statistics, elem, aggregation_measure)
-                if aggr_stat < min_performance:
-                    min_performance = aggr_stat
-                if aggr_stat > max_performance:
-                    max_performance = aggr_stat
-    return min_performance, max_performance
+    performance = [aggregate_stats(statistics, elem, aggregation_measure) for elem, stat in statistics.items() if
+                   type(elem) is PetriNet.Arc and stat["performance"]]
+    return min(performance, default=0), max(performance, default=0)
+
+
+def find_min_max_statistics(statistics, aggregation_measure=None, include_performance=True):
+    """
+    Find minimum and maximum transition frequency, arc frequency and arc performance
+    with a single pass over the element statistics (keeping the aggregated performance of the arcs)
+
+    Parameters
+    -----------
+    statistics
+        Element statistics
+    aggregation_measure
+        Aggregation measure (e.g. mean, min) to use
+    include_performance
+        Boolean value that tells if the arc performance should be aggregated
+
+    Returns
+    -----------
+    min_max_statistics
+        Dictionary containing:
+        - min_trans_frequency: minimum transition frequency (in the replay)
+        - max_trans_frequency: maximum transition frequency (in the replay)
+        - min_arc_frequency: minimum arc frequency
+        - max_arc_frequency: maximum arc frequency
+        - min_arc_performance: minimum arc performance
+        - max_arc_performance: maximum arc performance
+        - arc_performance: aggregated performance of the arcs having some performance values
+    """
+    trans_counts = []
+    arc_counts = []
+    arc_performance = {}
+    for elem, elem_stats in statistics.items():
+        elem_type = type(elem)
+        if elem_type is PetriNet.Transition:
+            trans_counts.append(elem_stats["count"])
+        elif elem_type is PetriNet.Arc:
+            arc_counts.append(elem_stats["count"])
+            if include_performance and elem_stats["performance"]:
+                arc_performance[elem] = aggregate_stats(statistics, elem, aggregation_measure)
+    return {"min_trans_frequency": min(trans_counts, default=0), "max_trans_frequency": max(trans_counts, default=0),
+            "min_arc_frequency": min(arc_counts, default=0), "max_arc_frequency": max(arc_counts, default=0),
+            "min_arc_performance": min(arc_performance.values(), default=0),
+            "max_arc_performance": max(arc_performance.values(), default=0), "arc_performance": arc_performance}
 
 
 def aggregate_statistics(statistics, measure="frequency", aggregation_measure=None):
@@ -372,29 +581,39 @@ def aggregate_statistics(statistics, measure="frequency", aggregation_measure=No
     aggregated_statistics
         Aggregated statistics for arcs, transitions, places
     """
-    min_trans_frequency, max_trans_frequency = find_min_max_trans_frequency(statistics)
-    min_arc_frequency, max_arc_frequency = find_min_max_arc_frequency(statistics)
-    min_arc_performance, max_arc_performance = find_min_max_arc_performance(statistics, aggregation_measure)
+    # the arc performance is aggregated only when it is shown
+    min_max_statistics = find_min_max_statistics(statistics, aggregation_measure=aggregation_measure,
+                                                 include_performance=measure == "performance")
+    arc_performance = min_max_statistics["arc_performance"]
+    if len(arc_performance) >= MIN_ARCS_BATCH_LABELS:
+        # the labels of all the arcs are computed at once
+        arc_performance_hr = dict(zip(arc_performance, human_readable_stat_batch(list(arc_performance.values()))))
+    else:
+        arc_performance_hr = {arc: human_readable_stat(perf) for arc, perf in arc_performance.items()}
     aggregated_statistics = {}
     for elem in statistics.keys():
-        if type(elem) is PetriNet.Arc:
+        elem_type = type(elem)
+        if elem_type is PetriNet.Arc:
             if measure == "frequency":
                 freq = statistics[elem]["count"]
-                arc_penwidth = get_arc_penwidth(freq, min_arc_frequency, max_arc_frequency)
+                arc_penwidth = get_arc_penwidth(freq, min_max_statistics["min_arc_frequency"],
+                                                min_max_statistics["max_arc_frequency"])
                 aggregated_statistics[elem] = {"label": str(freq), "penwidth": str(arc_penwidth)}
             elif measure == "performance":
-                if statistics[elem]["performance"]:
-                    aggr_stat = aggregate_stats(statistics, elem, aggregation_measure)
-                    aggr_stat_hr = human_readable_stat(aggr_stat)
-                    arc_penwidth = get_arc_penwidth(aggr_stat, min_arc_performance, max_arc_performance)
+                if elem in arc_performance:
+                    aggr_stat = arc_performance[elem]
+                    aggr_stat_hr = arc_performance_hr[elem]
+                    arc_penwidth = get_arc_penwidth(aggr_stat, min_max_statistics["min_arc_performance"],
+                                                    min_max_statistics["max_arc_performance"])
                     aggregated_statistics[elem] = {"label": aggr_stat_hr, "penwidth": str(arc_penwidth)}
-        elif type(elem) is PetriNet.Transition:
+        elif elem_type is PetriNet.Transition:
             if measure == "frequency":
                 if elem.label is not None:
                     freq = statistics[elem]["count"]
-                    color = get_trans_freq_color(freq, min_trans_frequency, max_trans_frequency)
+                    color = get_trans_freq_color(freq, min_max_statistics["min_trans_frequency"],
+                                                 min_max_statistics["max_trans_frequency"])
                     aggregated_statistics[elem] = {"label": elem.label + " (" + str(freq) + ")", "color": color}
-        elif type(elem) is PetriNet.Place:
+        elif elem_type is PetriNet.Place:
             pass
     return aggregated_statistics
 
@@ -446,7 +665,9 @@ def get_transition_performance_with_token_replay(log, net, im, fm):
                     transition_performance[str(el)]["all_values"] = sorted(
                         transition_performance[str(el)]["all_values"])
                     if transition_performance[str(el)]["all_values"]:
-                        transition_performance[str(el)]["mean"] = mean(transition_performance[str(el)]["all_values"])
+                        transition_performance[str(el)]["mean"] = fsum(
+                            transition_performance[str(el)]["all_values"]) / len(
+                            transition_performance[str(el)]["all_values"])
                         transition_performance[str(el)]["median"] = median(
                             transition_performance[str(el)]["all_values"])
     return transition_performance
@@ -3,6 +3,8 @@ import os
 import subprocess
 import sys
 
+import numpy as np
+
 MAX_EDGE_PENWIDTH_GRAPHVIZ = 2.6
 MIN_EDGE_PENWIDTH_GRAPHVIZ = 1.0
 
@@ -41,6 +43,34 @@ def human_readable_stat(c):
     return str(seconds) + "s"
 
 
+def human_readable_stat_batch(values):
+    """
+    Transform a list of timedeltas expressed in seconds into human readable strings
+    (same as human_readable_stat, with a single vectorized computation)
+
+    Parameters
+    ----------
+    values
+        Timedeltas expressed in seconds
+
+    Returns
+    ----------
+    strings
+        Human readable strings
+    """
+    c = np.trunc(np.asarray(values, dtype=np.float64)).astype(np.int64)
+    years = c // 31104000
+    months = c // 2592000
+    days = c // 86400
+    hours = c // 3600 % 24
+    minutes = c // 60 % 60
+    seconds = c % 60
+    conditions = [years > 0, months > 0, days > 0, hours > 0, minutes > 0]
+    numbers = np.select(conditions, [years, months, days, hours, minutes], default=seconds)
+    suffixes = np.select(conditions, ["Y", "MO", "D", "h", "m"], default="s")
+    return [str(n) + s for n, s in zip(numbers.tolist(), suffixes.tolist())]
+
+
 def get_arc_penwidth(arc_measure, min_arc_measure, max_arc_measure):
     """
     Calculate arc width given the current arc measure value, the minimum arc measure value and the
@@ -198,6 +198,205 @@ class OtherPartsTests(unittest.TestCase):
         from pm4py.statistics.eventually_follows.pandas import get
         efg = get.apply(dataframe, parameters={get.Parameters.START_TIMESTAMP_KEY: "start_timestamp"})
 
+    def test_correlation_mining_trace_based_xes(self):
+        log = xes_importer.apply(os.path.join("input_data", "running-example.xes"))
+        from pm4py.algo.discovery.correlation_mining import algorithm as correlation_miner
+        dfg, performance_dfg = correlation_miner.apply(log, variant=correlation_miner.Variants.TRACE_BASED)
+
+    def test_correlation_mining_trace_based_matrices(self):
+        log = xes_importer.apply(os.path.join("input_data", "running-example.xes"))
+        from pm4py.algo.discovery.correlation_mining.variants import trace_based
+        traces_list, trace_grouped_list, activities, activities_counter = trace_based.preprocess_log(log)
+        PS_matrix, duration_matrix = trace_based.get_PS_duration_matrix(activities, trace_grouped_list)
+        for i in range(len(activities)):
+            for j in range(len(activities)):
+                if i != j and PS_matrix[i, j] > 0:
+                    self.assertAlmostEqual(PS_matrix[i, j] + PS_matrix[j, i], 1.0, places=5)
+
+    def test_correlation_mining_trace_based_pandas(self):
+        dataframe = pd.read_csv(os.path.join("input_data", "running-example.csv"))
+        dataframe = dataframe_utils.convert_timestamp_columns_in_df(dataframe)
+        from pm4py.algo.discovery.correlation_mining import algorithm as correlation_miner
+        dfg, performance_dfg = correlation_miner.apply(dataframe, variant=correlation_miner.Variants.TRACE_BASED)
+        log = converter.apply(dataframe, variant=converter.Variants.TO_EVENT_LOG)
+        dfg_log, performance_dfg_log = correlation_miner.apply(log, variant=correlation_miner.Variants.TRACE_BASED)
+        self.assertEqual(dfg, dfg_log)
+
+    def test_correlation_mining_trace_based_interval(self):
+        log = xes_importer.apply(os.path.join("input_data", "interval_event_log.xes"))
+        from pm4py.algo.discovery.correlation_mining.variants import trace_based
+        parameters = {trace_based.Parameters.START_TIMESTAMP_KEY: "start_timestamp"}
+        dfg, performance_dfg = trace_based.apply(log, parameters=parameters)
+        traces_list, trace_grouped_list, activities, activities_counter = trace_based.preprocess_log(
+            log, parameters=parameters)
+        PS_matrix, duration_matrix = trace_based.get_PS_duration_matrix(activities, trace_grouped_list,
+                                                                         parameters=parameters)
+        dfg_matrices, performance_dfg_matrices = trace_based.resolve_lp_get_dfg(PS_matrix, duration_matrix,
+                                                                                activities, activities_counter)
+        self.assertEqual(dfg, dfg_matrices)
+
+    def test_correlation_mining_trace_based_reference_matrices(self):
+        import numpy as np
+        from datetime import datetime, timedelta
+        from pm4py.objects.log.log import EventLog, Trace, Event
+        from pm4py.algo.discovery.correlation_mining.variants import trace_based
+        parameters = {trace_based.Parameters.START_TIMESTAMP_KEY: "start_timestamp"}
+        interval_log = xes_importer.apply(os.path.join("input_data", "interval_event_log.xes"))
+        # overlapping executions of the same activity: the completion timestamps are not sorted inside the trace
+        base = datetime(2020, 1, 1)
+        overlapping_log = EventLog()
+        for events in [[("A", 0, 10), ("A", 1, 5), ("B", 6, 7), ("B", 8, 12), ("C", 11, 13)],
+                       [("B", 0, 2), ("A", 1, 9), ("A", 3, 4), ("C", 5, 6), ("A", 7, 8)]]:
+            overlapping_log.append(Trace([Event({"concept:name": act,
+                                                 "start_timestamp": base + timedelta(hours=st),
+                                                 "time:timestamp": base + timedelta(hours=et)})
+                                          for act, st, et in events]))
+        for log in [interval_log, overlapping_log]:
+            traces_list, trace_grouped_list, activities, activities_counter = trace_based.preprocess_log(
+                log, parameters=parameters)
+            PS_matrix, duration_matrix = trace_based.get_PS_duration_matrix(activities, trace_grouped_list,
+                                                                             parameters=parameters)
+            reference_PS_matrix = trace_based.get_precede_succeed_matrix(activities, trace_grouped_list,
+                                                                         "time:timestamp", "start_timestamp")
+            reference_duration_matrix = trace_based.get_duration_matrix(activities, trace_grouped_list,
+                                                                        "time:timestamp", "start_timestamp")
+            self.assertTrue(np.allclose(PS_matrix, reference_PS_matrix))
+            self.assertTrue(np.allclose(duration_matrix, reference_duration_matrix))
+
+    def test_correlation_mining_matching_stats(self):
+        import random
+        import numpy as np
+        from pm4py.algo.discovery.correlation_mining import util as cm_util
+        # the interpreted kernels, and the compiled ones (in the case numba is installed)
+        kernels_list = [cm_util.get_matching_stats_kernels(),
+                        cm_util.get_matching_stats_kernels(cm_util.MATCHING_STATS_JIT_THRESHOLD)]
+        random.seed(0)
+        for i in range(200):
+            ai = [float(random.randint(0, 20)) for _ in range(random.randint(0, 8))]
+            aj = [float(random.randint(0, 20)) for _ in range(random.randint(0, 8))]
+            if random.random() < 0.7:
+                ai = sorted(ai)
+                aj = sorted(aj)
+            for kernels in kernels_list:
+                for matching, kernel in [(cm_util.calculate_time_match_fifo, kernels[0]),
+                                         (cm_util.calculate_time_match_rlifo, kernels[1])]:
+                    times = matching(ai, aj)
+                    sum_times, count_times = kernel(np.array(ai, dtype=np.float64), np.array(aj, dtype=np.float64))
+                    self.assertEqual(count_times, len(times))
+                    self.assertAlmostEqual(sum_times, sum(x[1] - x[0] for x in times))
+
+    def test_human_readable_stat_batch(self):
+        from pm4py.util import vis_utils
+        values = [0, 59, 60, 3599, 3600, 86399, 86400, 2592000, 31104000, 59.9, 1e10, -0.5, -1, -59, -60, -3600,
+                  -86400, -2592000, -31104000]
+        self.assertEqual(vis_utils.human_readable_stat_batch(values),
+                         [vis_utils.human_readable_stat(x) for x in values])
+        self.assertEqual(vis_utils.human_readable_stat_batch([]), [])
+
+    def test_performance_map_array_replay(self):
+        import random
+        import numpy as np
+        from pm4py.objects.petri.petrinet import PetriNet, Marking
+        from pm4py.objects.petri import semantics, utils, performance_map
+        net = PetriNet("replay")
+        p1, p2, p3, p4 = [PetriNet.Place("p%d" % i) for i in range(1, 5)]
+        t_a = PetriNet.Transition("t_a", "a")
+        t_b = PetriNet.Transition("t_b", "b")
+        t_loop = PetriNet.Transition("t_loop", "c")
+        t_tau = PetriNet.Transition("t_tau", None)
+        t_end = PetriNet.Transition("t_end", "d")
+        for p in [p1, p2, p3, p4]:
+            net.places.add(p)
+        for t in [t_a, t_b, t_loop, t_tau, t_end]:
+            net.transitions.add(t)
+        # weighted arc
+        utils.add_arc_from_to(p1, t_a, net, weight=2)
+        utils.add_arc_from_to(t_a, p2, net)
+        # parallel arcs
+        utils.add_arc_from_to(p2, t_b, net)
+        utils.add_arc_from_to(p2, t_b, net)
+        utils.add_arc_from_to(t_b, p3, net)
+        # self-loop
+        utils.add_arc_from_to(p3, t_loop, net)
+        utils.add_arc_from_to(t_loop, p3, net)
+        # transition without input arcs
+        utils.add_arc_from_to(t_tau, p4, net, weight=3)
+        utils.add_arc_from_to(p3, t_end, net)
+        utils.add_arc_from_to(p4, t_end, net, weight=2)
+        marking_table = performance_map.get_marking_table(net)
+        place_id, transitions = marking_table[0], marking_table[1]
+
+        def to_array(marking):
+            array = np.zeros(len(place_id), dtype=np.int64)
+            for place in marking:
+                array[place_id[place]] = marking[place]
+            return array
+
+        random.seed(0)
+        for i in range(50):
+            marking = Marking({p: random.randint(1, 3) for p in net.places if random.random() < 0.5})
+            array = to_array(marking)
+            for t in random.choices(transitions, k=10):
+                mask = performance_map.get_enabled_transitions_mask(array, marking_table)
+                self.assertEqual(semantics.enabled_transitions(net, marking),
+                                 {transitions[k] for k in np.flatnonzero(mask)})
+                marking = semantics.weak_execute(t, marking)
+                array = performance_map.weak_execute_on_array(t, array, marking_table)
+                self.assertTrue(np.array_equal(to_array(marking), array))
+
+        # the marking gets empty after t_end, so t_tau is not replayed
+        initial_marking = Marking({p1: 2})
+        act_trans = [t_a, t_b, t_loop, t_end, t_tau]
+        trace = [{"concept:name": x} for x in ["a", "b", "c", "d"]]
+        annotation = performance_map.calculate_annotation_for_trace(trace, net, initial_marking, act_trans,
+                                                                    "concept:name")[0]
+        times_enabled = {t: 0 for t in transitions}
+        times_activated = {t: 0 for t in transitions}
+        marking = initial_marking
+        for t in act_trans:
+            enabled = semantics.enabled_transitions(net, marking)
+            for t2 in enabled:
+                times_enabled[t2] += 1
+            if t not in enabled:
+                times_enabled[t] += 1
+            times_activated[t] += 1
+            marking = semantics.weak_execute(t, marking)
+            if not marking:
+                break
+        self.assertEqual(times_activated[t_tau], 0)
+        for t in transitions:
+            self.assertEqual(annotation[t]["no_of_times_enabled"] if t in annotation else 0, times_enabled[t])
+            self.assertEqual(annotation[t]["no_of_times_activated"] if t in annotation else 0, times_activated[t])
+
+    def test_performance_map_traces_timestamps(self):
+        import time
+        from datetime import datetime, timedelta, timezone
+        from pm4py.objects.log.log import EventLog, Trace, Event
+        from pm4py.objects.petri import performance_map
+        naive = Trace([Event({"time:timestamp": datetime(2020, 3, 29, 1)}),
+                       Event({"time:timestamp": datetime(2020, 3, 29, 4, 0, 0, 1)})])
+        aware = Trace([Event({"time:timestamp": datetime(2020, 3, 29, 1, tzinfo=timezone(timedelta(hours=1)))}),
+                       Event({"time:timestamp": datetime(2020, 3, 29, 4, tzinfo=timezone.utc)})])
+        mixed = Trace([naive[0], aware[1]])
+        old_tz = os.environ.get("TZ")
+        # the naive timestamps must not be read as local time (across a DST change)
+        os.environ["TZ"] = "Europe/Rome"
+        if hasattr(time, "tzset"):
+            time.tzset()
+        try:
+            traces_timestamps = performance_map.get_traces_timestamps(EventLog([naive, aware, mixed]))
+        finally:
+            if old_tz is None:
+                del os.environ["TZ"]
+            else:
+                os.environ["TZ"] = old_tz
+            if hasattr(time, "tzset"):
+                time.tzset()
+        for trace, timestamps in zip([naive, aware], traces_timestamps):
+            self.assertEqual((timestamps[1] - timestamps[0]) / 1000000,
+                             (trace[1]["time:timestamp"] - trace[0]["time:timestamp"]).total_seconds())
+        self.assertIsNone(traces_timestamps[2])
+
 
 if __name__ == "__main__":
     unittest.main()